@@ -0,0 +1,95 @@
+import sys
+import time
+
+from game import *
+from players.minimax_player import MinimaxPlayer
+from players.move_ordering import MoveOrdering
+from players.random_player import RandomPlayer
+
+
+def benchmark_dim(dim: int, playouts: int) -> Tuple[float, float, float]:
+    """Plays random playouts on a board of the given size and measures the number of moves applied per second,
+    the number of move generations per second, and the number of complete playouts per second.
+    """
+    player = RandomPlayer(seed=dim)
+    update_time = 0.0
+    moves_time = 0.0
+    updates = 0
+    start_time = time.perf_counter()
+    for _ in range(playouts):
+        game = UltimateTicTacToe(dim=dim, verbose=False)
+        while not game.is_game_over():
+            moves_start_time = time.perf_counter()
+            _, valid_moves = game.get_valid_miniboards_and_moves()
+            update_start_time = time.perf_counter()
+            moves_time += update_start_time - moves_start_time
+            game.update(player.random_gen.choice(valid_moves))
+            update_time += time.perf_counter() - update_start_time
+            updates += 1
+    total_time = time.perf_counter() - start_time
+    return updates / update_time, updates / moves_time, playouts / total_time
+
+
+def find_benchmark_positions(num_positions: int) -> List[UltimateTicTacToe]:
+    """Finds a fixed set of positions from the opening to the late middlegame by playing seeded random moves.
+    """
+    positions = []
+    for i in range(num_positions):
+        player = RandomPlayer(seed=i)
+        game = UltimateTicTacToe(verbose=False)
+        for _ in range(2 + (i * 50) // num_positions):
+            game.update(player.choose_move(game))
+            if game.is_game_over():
+                break
+        if not game.is_game_over():
+            positions.append(game)
+    return positions
+
+
+def benchmark_ordering(player: MinimaxPlayer, positions: List[UltimateTicTacToe],
+                       depth: int) -> Tuple[int, float, List[int]]:
+    """Searches every position at a fixed depth and measures the number of nodes searched, the share of cutoffs
+    caused by the first move searched, and the minimax value of each position.
+    """
+    values = []
+    for game in positions:
+        if player.ordering is not None:
+            player.ordering.start_search()
+        value, _ = player.apply_minimax_with_alpha_beta(game, (-1 * player.inf, None), (player.inf, None), depth)
+        values.append(value)
+    return player.nodes, player.first_move_cutoffs / max(player.cutoffs, 1), values
+
+
+if __name__ == "__main__":
+    """Benchmarks the game engine with random playouts for boards of dimension 3, 4, and 5 (81, 256, and 625 squares).
+    Pass the number of playouts per dimension as a number (100 by default). Pass --ordering to instead benchmark
+    the move orderings of the minimax agent at a fixed depth of 4 on a set of 20 positions.
+    """
+    num_playouts = 100
+    for arg in sys.argv[1:]:
+        if arg.isnumeric():
+            num_playouts = int(arg)
+    if "--ordering" in sys.argv:
+        benchmark_positions = find_benchmark_positions(20)
+        orderings = {"None": None,
+                     "Static": MoveOrdering(killers=False, history=False),
+                     "Killers & history": MoveOrdering(static=False),
+                     "All": MoveOrdering()}
+        base_nodes = None
+        base_values = None
+        print("Ordering | Nodes | Node reduction | First-move cutoff rate")
+        for name, ordering in orderings.items():
+            minimax_player = MinimaxPlayer(ordering=ordering, order_moves=ordering is not None)
+            nodes, first_move_rate, minimax_values = benchmark_ordering(minimax_player, benchmark_positions, 4)
+            base_nodes = base_nodes if base_nodes is not None else nodes
+            base_values = base_values if base_values is not None else minimax_values
+            if minimax_values != base_values:
+                print("Warning: the minimax values differ from the unordered search.")
+            print(name + " | " + str(nodes) + " | " + "{:.1%}".format(1 - nodes / base_nodes) + " | " +
+                  "{:.1%}".format(first_move_rate))
+    else:
+        print("Dim | Squares | Updates/s | Move generations/s | Playouts/s")
+        for d in (3, 4, 5):
+            updates_per_sec, moves_per_sec, playouts_per_sec = benchmark_dim(d, num_playouts)
+            print(str(d) + " | " + str(d ** 4) + " | " + "{:.0f}".format(updates_per_sec) + " | " +
+                  "{:.0f}".format(moves_per_sec) + " | " + "{:.1f}".format(playouts_per_sec))
@@ -0,0 +1,90 @@
+import sys
+import threading
+import time
+
+from game import *
+from players.dqn import DQN
+from players.dqn_client import DQNClient
+from players.dqn_service import DQNInferenceServer
+from players.random_player import RandomPlayer
+
+
+def find_positions(num_positions: int) -> List[UltimateTicTacToe]:
+    """Finds positions from seeded random games to send to the server.
+    """
+    positions = []
+    player = RandomPlayer(seed=0)
+    while len(positions) < num_positions:
+        game = UltimateTicTacToe(verbose=False)
+        while not game.is_game_over() and len(positions) < num_positions:
+            positions.append(game.clone())
+            game.update(player.choose_move(game))
+    return positions
+
+
+def benchmark_concurrency(address: Tuple[str, int], clients: int, requests: int,
+                          positions: List[UltimateTicTacToe]) -> Tuple[float, float]:
+    """Evaluates positions from many concurrent clients and measures the throughput in positions per second
+    and the 99th percentile latency in milliseconds.
+    """
+    latencies = []
+    lock = threading.Lock()
+
+    def run_client(client_i: int) -> None:
+        client = DQNClient(3, *address)
+        client_latencies = []
+        for i in range(requests):
+            start_time = time.perf_counter()
+            client.evaluate(positions[(client_i * requests + i) % len(positions)], to_board=False)
+            client_latencies.append(time.perf_counter() - start_time)
+        client.close()
+        with lock:
+            latencies.extend(client_latencies)
+
+    threads = [threading.Thread(target=run_client, args=(i,)) for i in range(clients)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_time = time.perf_counter() - start_time
+    latencies.sort()
+    return len(latencies) / total_time, 1000 * latencies[int(0.99 * (len(latencies) - 1))]
+
+
+if __name__ == "__main__":
+    """Serves the model in dqn_model to many concurrent games, batching their evaluations. Games connect with
+    DeepQLearningPlayer(server=("localhost", 5757)) or evaluate.py --server=localhost:5757.
+    Options: --port=N, --batch=N (maximum batch size, 32 by default), and --wait=N (maximum wait in milliseconds
+    for a batch to fill, 2 by default). Pass --benchmark to instead measure throughput and p99 latency
+    with 1 to 64 concurrent clients, and --untrained to serve a freshly initialized network of the same architecture
+    (e.g. to benchmark where the saved model cannot be loaded).
+    """
+    options = {}
+    for arg in sys.argv[1:]:
+        if arg.startswith("--"):
+            key, _, value = arg[2:].partition("=")
+            options[key] = value
+    untrained_model = DQN(3, False) if "untrained" in options else None
+    server = DQNInferenceServer(port=int(options.get("port", 5757)), model=untrained_model,
+                                max_batch_size=int(options.get("batch", 32)),
+                                max_wait=float(options.get("wait", 2)) / 1000)
+    server.start()
+    if "benchmark" in options:
+        benchmark_positions = find_positions(1000)
+        print("Clients | Positions/s | p99 latency (ms) | Mean batch size")
+        for num_clients in (1, 2, 4, 8, 16, 32, 64):
+            server.batches = 0
+            server.batched_requests = 0
+            throughput, p99_latency = benchmark_concurrency(server.get_address(), num_clients, 100,
+                                                            benchmark_positions)
+            print(str(num_clients) + " | " + "{:.0f}".format(throughput) + " | " + "{:.1f}".format(p99_latency) +
+                  " | " + "{:.1f}".format(server.get_mean_batch_size()))
+        server.stop()
+    else:
+        print("Serving on " + str(server.get_address()) + ". Press Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.stop()
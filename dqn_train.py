@@ -1,23 +1,58 @@
 import sys
 
 from game import *
+from players.dqn_metrics import NullMetrics, TrainingMetrics
 from players.dqn_player import DeepQLearningPlayer
 
 if __name__ == "__main__":
-    """Trains the deep q-learning agent via self-play.
+    """Trains the deep q-learning agent via self-play. Pass the number of epochs as a number, and --resume to
+    continue from the latest checkpoint in dqn_checkpoints (checkpoints are written there in the background).
+    Pass --pipeline to sample batches from a replay memory through the prefetching tf.data input pipeline,
+    and --no-augment to turn off its random rotations and reflections.
+    Pass --metrics=PATH to write throughput, timing, loss, and memory metrics every ten seconds to a JSONL file
+    (or a CSV file, for a path ending in .csv), --tensorboard=DIR to also write them as TensorBoard event files,
+    and use metrics_report.py to see where the training time went. Pass --dim=N to train on boards of dimension N
+    (3 by default); the network is saved to dqn_model_N and checkpointed to dqn_checkpoints_N for N other than 3.
     """
     num_epochs = 10
-    if len(sys.argv) == 2:
-        if sys.argv[1].isnumeric():
-            num_epochs = int(sys.argv[1])
-    player_x = DeepQLearningPlayer(load=False, train=True, epochs=num_epochs)
+    dim = 3
+    resume = False
+    pipeline = False
+    augment = True
+    metrics_path = None
+    tensorboard_dir = None
+    for arg in sys.argv[1:]:
+        if arg.isnumeric():
+            num_epochs = int(arg)
+        elif arg == "--resume":
+            resume = True
+        elif arg == "--pipeline":
+            pipeline = True
+        elif arg == "--no-augment":
+            augment = False
+        elif arg.startswith("--dim="):
+            dim = int(arg[len("--dim="):])
+        elif arg.startswith("--metrics="):
+            metrics_path = arg[len("--metrics="):]
+        elif arg.startswith("--tensorboard="):
+            tensorboard_dir = arg[len("--tensorboard="):]
+    if metrics_path is not None:
+        metrics = TrainingMetrics(metrics_path, tensorboard_dir=tensorboard_dir)
+    else:
+        metrics = NullMetrics()
+    checkpoint_dir = "dqn_checkpoints" if dim == 3 else "dqn_checkpoints_" + str(dim)
+    player_x = DeepQLearningPlayer(load=False, dim=dim, train=True, epochs=num_epochs, checkpoint_dir=checkpoint_dir,
+                                   resume=resume, pipeline=pipeline, augment=augment,
+                                   metrics=metrics)
     player_o = player_x
     while not player_x.is_training_complete():
-        game = UltimateTicTacToe(verbose=False)
-        while not game.is_game_over():
-            if game.get_curr_player() == 1:
-                move = player_x.choose_move(game)
-            else:
-                move = player_o.choose_move(game)
-            game.update(move)
+        game = UltimateTicTacToe(dim=dim, verbose=False)
+        with metrics.time("self_play"):
+            while not game.is_game_over():
+                if game.get_curr_player() == 1:
+                    move = player_x.choose_move(game)
+                else:
+                    move = player_o.choose_move(game)
+                game.update(move)
         player_x.update_trainer()
+    metrics.close()
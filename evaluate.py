@@ -0,0 +1,301 @@
+import json
+import os
+import sys
+from itertools import combinations
+from math import log, log10, sqrt
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+from main import PLAYERS, DeepQLearningPlayer, create_player
+from util import play_game
+
+Results = Tuple[float, float, float]  # wins, draws, and losses of the first agent
+
+
+def score_to_elo(score: float) -> float:
+    return -400 * log10(1 / score - 1)
+
+
+def elo_to_score(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def regularize(results: Results) -> Results:
+    """Adds half a win, a draw, and a loss so that lopsided results still have a finite Elo and a nonzero variance.
+    """
+    return results[0] + 0.5, results[1] + 0.5, results[2] + 0.5
+
+
+def find_score_and_variance(results: Results) -> Tuple[float, float]:
+    """Finds the mean score per game of the first agent and the variance of a single game's score.
+    """
+    wins, draws, losses = regularize(results)
+    games = wins + draws + losses
+    score = (wins + 0.5 * draws) / games
+    variance = (wins + 0.25 * draws) / games - score ** 2
+    return score, variance
+
+
+def find_elo_interval(results: Results, z: float = 1.96) -> Tuple[float, float, float]:
+    """Estimates the Elo difference of the first agent and the bounds of its confidence interval.
+    """
+    score, variance = find_score_and_variance(results)
+    games = sum(results)
+    error = z * sqrt(variance / games) if games > 0 else 0.5
+    lower = min(max(score - error, 1e-6), 1 - 1e-6)
+    upper = min(max(score + error, 1e-6), 1 - 1e-6)
+    return score_to_elo(score), score_to_elo(lower), score_to_elo(upper)
+
+
+def find_llr(results: Results, elo_0: float, elo_1: float) -> float:
+    """Approximates the log-likelihood ratio of the hypotheses that the Elo difference is elo_1 rather than elo_0,
+    using the normal approximation of the generalized sequential probability ratio test.
+    """
+    score, variance = find_score_and_variance(results)
+    score_0 = elo_to_score(elo_0)
+    score_1 = elo_to_score(elo_1)
+    return sum(results) * (score_1 - score_0) * (2 * score - score_0 - score_1) / (2 * variance)
+
+
+class MatchEvaluator:
+    """Plays games between two agents in parallel batches, alternating who moves first, and stops once a stopping
+    criterion is met. With the sequential probability ratio test, one test decides whether the agent is stronger by
+    elo_1 rather than elo_0, and a mirrored test whether it is weaker by elo_1 rather than elo_0. The match stops once
+    either test shows a difference, or once both show that there is none. With the confidence interval criterion, the match stops once the interval excludes an even match
+    or is narrower than max_error Elo on both sides.
+    """
+    def __init__(self, flag_1: str, flag_2: str, max_games: int = 1000, batch_size: int = 8, processes: int = 1,
+                 criterion: str = "sprt", elo_0: float = 0, elo_1: float = 50, alpha: float = 0.05,
+                 beta: float = 0.05, max_error: float = 50, server: Optional[Tuple[str, int]] = None, dim: int = 3):
+        self.flag_1 = flag_1
+        self.flag_2 = flag_2
+        self.max_games = max_games
+        self.batch_size = batch_size
+        self.processes = processes
+        self.criterion = criterion
+        self.elo_0 = elo_0
+        self.elo_1 = elo_1
+        self.lower_bound = log(beta / (1 - alpha))
+        self.upper_bound = log((1 - beta) / alpha)
+        self.max_error = max_error
+        self.server = server
+        self.dim = dim
+        self.results = (0, 0, 0)
+        self.sprt_decisions = [None, None]  # whether each test accepted its alternative hypothesis
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def run(self) -> Results:
+        pool = Pool(self.processes, initializer=_init_worker, initargs=(self.flag_1, self.flag_2, self.server, self.dim)) \
+            if self.processes > 1 else None
+        if pool is None:
+            _init_worker(self.flag_1, self.flag_2, self.server, self.dim)
+        try:
+            games = 0
+            while games < self.max_games and not self.is_complete():
+                batch = [(games + i) % 2 == 0 for i in range(min(self.batch_size, self.max_games - games))]
+                outcomes = pool.map(_play, batch) if pool is not None else [_play(is_first) for is_first in batch]
+                self.add_scores([score for score, _, _ in outcomes])
+                self.cache_hits += sum(hits for _, hits, _ in outcomes)
+                self.cache_misses += sum(misses for _, _, misses in outcomes)
+                games += len(batch)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return self.results
+
+    def add_scores(self, scores: List[float]) -> None:
+        wins, draws, losses = self.results
+        for score in scores:
+            if score == 1:
+                wins += 1
+            elif score == 0:
+                losses += 1
+            else:
+                draws += 1
+        self.results = (wins, draws, losses)
+
+    def is_complete(self) -> bool:
+        if sum(self.results) < 2:
+            return False
+        if self.criterion == "sprt":
+            for test_i, sign in enumerate((1, -1)):
+                if self.sprt_decisions[test_i] is None:  # a test is over once it crosses a bound
+                    self.sprt_decisions[test_i] = self.find_sprt_decision(sign * self.elo_0, sign * self.elo_1)
+            return True in self.sprt_decisions or self.sprt_decisions == [False, False]
+        elo, lower, upper = find_elo_interval(self.results)
+        return lower > 0 or upper < 0 or max(elo - lower, upper - elo) < self.max_error
+
+    def find_sprt_decision(self, elo_0: float, elo_1: float) -> Optional[bool]:
+        """Determines whether the test accepts the hypothesis of elo_1 (True) or of elo_0 (False),
+        or None if more games are needed.
+        """
+        llr = find_llr(self.results, elo_0, elo_1)
+        if llr >= self.upper_bound:
+            return True
+        if llr <= self.lower_bound:
+            return False
+        return None
+
+    def summarize(self) -> str:
+        elo, lower, upper = find_elo_interval(self.results)
+        return (PLAYERS[self.flag_1].__name__ + " vs. " + PLAYERS[self.flag_2].__name__ + ": " +
+                "W: " + str(self.results[0]) + ", D: " + str(self.results[1]) + ", L: " + str(self.results[2]) +
+                ", Elo: " + "{:+.0f}".format(elo) + " [" + "{:+.0f}".format(lower) + ", " +
+                "{:+.0f}".format(upper) + "] (95%)" + self.summarize_cache())
+
+    def summarize_cache(self) -> str:
+        """Summarizes the DQN forward passes per game with and without the evaluation cache, if a DQN agent played.
+        """
+        games = sum(self.results)
+        lookups = self.cache_hits + self.cache_misses
+        if games == 0 or lookups == 0:
+            return ""
+        return (", DQN forward passes per game: " + "{:.1f}".format(self.cache_misses / games) + " (" +
+                "{:.1f}".format(lookups / games) + " without cache, hit rate " +
+                "{:.1%}".format(self.cache_hits / lookups) + ")")
+
+
+_players = {}
+_dim = 3
+
+
+def _init_worker(flag_1: str, flag_2: str, server: Optional[Tuple[str, int]], dim: int) -> None:
+    """Creates the agents once per worker process, since they cannot be sent between processes.
+    """
+    global _dim
+    _dim = dim
+    _players[1] = create_player(flag_1, server, dim)
+    _players[2] = create_player(flag_2, server, dim)
+
+
+def _count_cache_lookups() -> Tuple[int, int]:
+    """Counts the evaluation cache hits and misses of the DQN agents of the worker.
+    """
+    caches = [p.model.cache for p in _players.values()
+              if isinstance(p, DeepQLearningPlayer) and hasattr(p.model, "cache")]
+    return sum(cache.hits for cache in caches), sum(cache.misses for cache in caches)
+
+
+def _play(is_first: bool) -> Tuple[float, int, int]:
+    """Plays one game and returns the score of the first agent
+    and the evaluation cache hits and misses of the DQN agents during the game.
+    """
+    hits, misses = _count_cache_lookups()
+    if is_first:
+        winner = play_game(_players[1], _players[2], _dim)
+    else:
+        winner = -1 * play_game(_players[2], _players[1], _dim)
+    end_hits, end_misses = _count_cache_lookups()
+    return (winner + 1) / 2, end_hits - hits, end_misses - misses
+
+
+class RatingTable:
+    """Accumulates the results of every pair of agents across runs in a JSON file
+    and fits Elo ratings to all of them, anchored at the random agent.
+    """
+    ANCHOR = "RandomPlayer"
+
+    def __init__(self, path: str = "ratings.json"):
+        self.path = path
+        self.results = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.results = {tuple(key.split(" vs. ")): tuple(value) for key, value in json.load(f).items()}
+
+    def add(self, name_1: str, name_2: str, results: Results) -> None:
+        if (name_2, name_1) in self.results:
+            name_1, name_2 = name_2, name_1
+            results = results[2], results[1], results[0]
+        previous = self.results.get((name_1, name_2), (0, 0, 0))
+        self.results[(name_1, name_2)] = tuple(p + r for p, r in zip(previous, results))
+
+    def save(self) -> None:
+        with open(self.path, "w") as f:
+            json.dump({" vs. ".join(key): value for key, value in self.results.items()}, f, indent=2)
+
+    def find_ratings(self, iterations: int = 1000) -> Dict[str, float]:
+        """Fits Bradley-Terry strengths (counting a draw as half a win) with minorization-maximization updates
+        and converts them to Elo ratings.
+        """
+        names = sorted({name for key in self.results for name in key})
+        strengths = {name: 1.0 for name in names}
+        for _ in range(iterations):
+            for name in names:
+                points = 0
+                denominator = 0
+                for (name_1, name_2), results in self.results.items():
+                    if name not in (name_1, name_2):
+                        continue
+                    wins, draws, losses = regularize(results)
+                    other = name_2 if name == name_1 else name_1
+                    points += (wins if name == name_1 else losses) + 0.5 * draws
+                    denominator += (wins + draws + losses) / (strengths[name] + strengths[other])
+                strengths[name] = points / denominator
+        anchor = strengths.get(self.ANCHOR, 1.0)
+        return {name: 400 * log10(strength / anchor) for name, strength in strengths.items()}
+
+    def count_games(self, name: str) -> int:
+        return int(sum(sum(results) for key, results in self.results.items() if name in key))
+
+    def summarize(self) -> str:
+        ratings = self.find_ratings()
+        lines = ["Agent | Elo | Games"]
+        for name in sorted(ratings, key=ratings.get, reverse=True):
+            lines.append(name + " | " + "{:+.0f}".format(ratings[name]) + " | " + str(self.count_games(name)))
+        return "\n".join(lines)
+
+
+def process_options(argv: List[str]) -> Tuple[List[str], Dict[str, str]]:
+    """Splits command line arguments into player flags and --key=value options.
+    """
+    flags = [arg for arg in argv if arg in PLAYERS]
+    options = {}
+    for arg in argv:
+        if arg.startswith("--"):
+            key, _, value = arg[2:].partition("=")
+            options[key] = value
+    return flags, options
+
+
+def create_evaluator(flag_1: str, flag_2: str, options: Dict[str, str]) -> MatchEvaluator:
+    server = None
+    if "server" in options:
+        host, _, port = options["server"].rpartition(":")
+        server = (host, int(port))
+    return MatchEvaluator(flag_1, flag_2, server=server, dim=int(options.get("dim", 3)),
+                          max_games=int(options.get("games", 1000)),
+                          processes=int(options.get("processes", 1)),
+                          batch_size=int(options.get("batch", 8)),
+                          criterion="ci" if "ci" in options else "sprt",
+                          elo_1=float(options.get("elo", 50)))
+
+
+if __name__ == "__main__":
+    """Compares agents with as few games as needed. Use -d, -m, and -r as in main.py to play a match between two
+    agents, or --round-robin to play every pair of registered agents (except the human player). Matches stop early
+    once a sequential probability ratio test (or, with --ci, the 95% confidence interval) is decisive.
+    Other options: --games=N (maximum games per match), --processes=N, --batch=N (games per batch),
+    --elo=N (Elo difference tested by the SPRT), --ratings=PATH (rating table kept across runs), and
+    --server=HOST:PORT (evaluate the DQN agent through a shared inference server started with dqn_server.py), and
+    --dim=N (board dimension, 3 by default; the ratings of other dimensions are kept in ratings_N.json).
+    """
+    player_flags, player_options = process_options(sys.argv[1:])
+    board_dim = int(player_options.get("dim", 3))
+    table = RatingTable(player_options.get("ratings", "ratings.json" if board_dim == 3
+                                           else "ratings_" + str(board_dim) + ".json"))
+    if "round-robin" in player_options:
+        pairs = list(combinations([flag for flag in PLAYERS if not PLAYERS[flag].IS_HUMAN], 2))
+    elif len(player_flags) == 2:
+        pairs = [(player_flags[0], player_flags[1])]
+    else:
+        pairs = [("-r", "-r")]
+    for flag_a, flag_b in pairs:
+        evaluator = create_evaluator(flag_a, flag_b, player_options)
+        results = evaluator.run()
+        print(evaluator.summarize())
+        if flag_a != flag_b:
+            table.add(PLAYERS[flag_a].__name__, PLAYERS[flag_b].__name__, results)
+    table.save()
+    print(table.summarize())
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import copy
 from typing import List, Set
 
 from players.player import *
@@ -13,21 +12,26 @@ class UltimateTicTacToe:
         self.board = [[0] * (self.dim ** 2) for _ in range(self.dim ** 2)]
         self.maxiboard = [0 for _ in range(self.dim ** 2)]
         self.win_configs = self._find_win_configs()
+        self.square_configs = self._find_square_configs()
         self.curr_mini_i = -1
         self.curr_player = 1
         self.winner = 0
         self.squares_left = self.dim ** 4
+        self._reset_counts()
 
     def update(self, move: Move) -> None:
         """Updates the board, maxiboard, and miniboard states based on the move taken by the current player
-        and prepares for the next move by the opposing player.
+        and prepares for the next move by the opposing player. Only the winning configurations through the played
+        square can be completed by the move, so wins are detected by counting the squares of each configuration
+        claimed by each player instead of rescanning the board.
         """
-        self.board[move[0]][move[1]] = self.curr_player  # board updated with the requested move
-        self.curr_mini_i = move[0] if self.curr_mini_i == -1 else self.curr_mini_i
-        if self.maxiboard[self.curr_mini_i] == 0 and self._is_board_won(self.board[self.curr_mini_i]):
-            self.maxiboard[self.curr_mini_i] = self.curr_player
-        if self._is_board_won(self.maxiboard):
-            self.winner = self.curr_player
+        mini_i = move[0]  # not curr_mini_i, which is stale if the move history is replayed without validation
+        self.board[mini_i][move[1]] = self.curr_player  # board updated with the requested move
+        self.empty_counts[mini_i] -= 1
+        if self._claim_square(self.mini_counts[mini_i], move[1]) and self.maxiboard[mini_i] == 0:
+            self.maxiboard[mini_i] = self.curr_player
+            if self._claim_square(self.maxi_counts, mini_i):
+                self.winner = self.curr_player
         self.squares_left -= 1
         if self.verbose:
             self.draw_board()
@@ -39,13 +43,14 @@ class UltimateTicTacToe:
         """Gets all the possible moves as tuples for the current player.
         Note that all valid moves are contained in a single miniboard unless there are none in that miniboard.
         """
-        valid_moves_in_miniboard = [(self.curr_mini_i, i) for i, s
-                                    in enumerate(self.board[self.curr_mini_i]) if s == 0]
-        if self.curr_mini_i == -1 or not valid_moves_in_miniboard:
+        if self.curr_mini_i == -1 or self.empty_counts[self.curr_mini_i] == 0:
             self.curr_mini_i = -1
-            all_valid_moves = [(mini_i, i) for mini_i in range(9) for i, s in enumerate(self.board[mini_i]) if s == 0]
+            all_valid_moves = [(mini_i, i) for mini_i in range(self.dim ** 2) if self.empty_counts[mini_i] > 0
+                               for i, s in enumerate(self.board[mini_i]) if s == 0]
             return self.curr_mini_i, all_valid_moves
 
+        valid_moves_in_miniboard = [(self.curr_mini_i, i) for i, s
+                                    in enumerate(self.board[self.curr_mini_i]) if s == 0]
         return self.curr_mini_i, valid_moves_in_miniboard
 
     def get_curr_player(self) -> int:
@@ -66,6 +71,27 @@ class UltimateTicTacToe:
     def get_squares_left(self) -> int:
         return self.squares_left
 
+    def get_empty_squares(self, mini_i: int) -> int:
+        return self.empty_counts[mini_i]
+
+    def is_miniboard_winning_move(self, move: Move) -> bool:
+        """Determines whether the move claims an unclaimed miniboard for the current player.
+        """
+        if self.maxiboard[move[0]] != 0:
+            return False
+        player_counts = self.mini_counts[move[0]][0 if self.curr_player == 1 else 1]
+        return any(player_counts[config_i] == self.dim - 1 for config_i in self.square_configs[move[1]])
+
+    def can_win_miniboard(self, mini_i: int, player: int) -> bool:
+        """Determines whether the player can claim the unclaimed miniboard with a single move.
+        """
+        if self.maxiboard[mini_i] != 0:
+            return False
+        player_counts = self.mini_counts[mini_i][0 if player == 1 else 1]
+        opponent_counts = self.mini_counts[mini_i][1 if player == 1 else 0]
+        return any(player_counts[config_i] == self.dim - 1 and opponent_counts[config_i] == 0
+                   for config_i in range(len(self.win_configs)))
+
     def set_verbose(self, verbose: bool) -> None:
         self.verbose = verbose
 
@@ -77,21 +103,27 @@ class UltimateTicTacToe:
         return False
 
     def clone(self) -> UltimateTicTacToe:
-        """Clones the game at the current state.
+        """Clones the game at the current state. The winning configurations never change, so they are shared.
         """
-        clone = copy.deepcopy(self)
+        clone = UltimateTicTacToe.__new__(UltimateTicTacToe)
+        clone.__dict__.update(self.__dict__)
+        clone.board = [miniboard[:] for miniboard in self.board]
+        clone.maxiboard = self.maxiboard[:]
+        clone.empty_counts = self.empty_counts[:]
+        clone.mini_counts = [[counts[:] for counts in mini_counts] for mini_counts in self.mini_counts]
+        clone.maxi_counts = [counts[:] for counts in self.maxi_counts]
         return clone
 
     def draw_board(self) -> None:
         """Draws the game state in text.
         """
-        for i in range(3):
-            print('-' * 3 * (3 + 1))
-            for j in range(3):
+        for i in range(self.dim):
+            print('-' * self.dim * (self.dim + 1))
+            for j in range(self.dim):
                 line = []
-                for mini_i in range(3 * i, 3 * (i + 1)):
+                for mini_i in range(self.dim * i, self.dim * (i + 1)):
                     line.append('|')
-                    for square_i in range(3 * j, 3 * (j + 1)):
+                    for square_i in range(self.dim * j, self.dim * (j + 1)):
                         if self.board[mini_i][square_i] == 1:
                             line.append('X')
                         elif self.board[mini_i][square_i] == -1:
@@ -99,7 +131,7 @@ class UltimateTicTacToe:
                         else:
                             line.append(' ')
                 print(''.join(line))
-        print('-' * 3 * (3 + 1))
+        print('-' * self.dim * (self.dim + 1))
 
     def reset(self) -> None:
         """Resets the game to the starting state.
@@ -110,6 +142,27 @@ class UltimateTicTacToe:
         self.curr_player = 1
         self.winner = 0
         self.squares_left = self.dim ** 4
+        self._reset_counts()
+
+    def _reset_counts(self) -> None:
+        """Resets the number of empty squares in each miniboard and the number of squares claimed by each player
+        (player 1 at index 0, player -1 at index 1) in each winning configuration of each board.
+        """
+        self.empty_counts = [self.dim ** 2] * (self.dim ** 2)
+        self.mini_counts = [[[0] * len(self.win_configs) for _ in range(2)] for _ in range(self.dim ** 2)]
+        self.maxi_counts = [[0] * len(self.win_configs) for _ in range(2)]
+
+    def _claim_square(self, counts: List[List[int]], square_i: int) -> bool:
+        """Counts the square towards the winning configurations of the current player that contain it
+        and determines whether one of them is now complete.
+        """
+        player_counts = counts[0 if self.curr_player == 1 else 1]
+        is_won = False
+        for config_i in self.square_configs[square_i]:
+            player_counts[config_i] += 1
+            if player_counts[config_i] == self.dim:
+                is_won = True
+        return is_won
 
     def _find_win_configs(self) -> List[Set[int]]:
         """Defines all the winning configurations of the tic-tac-toe board.
@@ -119,14 +172,11 @@ class UltimateTicTacToe:
             win_configs.append(set(range(self.dim * i, self.dim * (i + 1))))  # horizontals
             win_configs.append(set(range(i, self.dim ** 2, self.dim)))  # verticals
         win_configs.append(set(range(0, self.dim ** 2, self.dim + 1)))  # major diagonal
-        win_configs.append(set(range(self.dim - 1, self.dim ** 2 - 1, self.dim - 1)))  # minor diagonal
+        win_configs.append({self.dim * r + (self.dim - 1 - r) for r in range(self.dim)})  # minor diagonal
         return win_configs
 
-    def _is_board_won(self, board: List[int]) -> bool:
-        """Determines whether the current player has won a previously unclaimed board.
+    def _find_square_configs(self) -> List[List[int]]:
+        """Finds the indices of the winning configurations that contain each square.
         """
-        claimed_squares = {i for i, s in enumerate(board) if s == self.curr_player}
-        for config in self.win_configs:
-            if config.issubset(claimed_squares):
-                return True
-        return False
+        return [[config_i for config_i, config in enumerate(self.win_configs) if square_i in config]
+                for square_i in range(self.dim ** 2)]
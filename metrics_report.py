@@ -0,0 +1,72 @@
+import csv
+import json
+import sys
+from typing import Any, Dict, List
+
+TIMERS = [("self_play", "Self-play"),
+          ("move_selection", "  of which move selection"),
+          ("input_wait", "Waiting for input"),
+          ("target_computation", "Target computation"),
+          ("train_on_batch", "train_on_batch"),
+          ("snapshot", "Checkpoint snapshots"),
+          ("checkpoint_wait", "Waiting for checkpoints and saves"),
+          ("save", "Model saves (background)"),
+          ("checkpoint_write", "Checkpoint writes (background)")]
+
+
+def read_records(path: str) -> List[Dict[str, Any]]:
+    """Reads the records written by TrainingMetrics from a JSONL or CSV file.
+    """
+    with open(path, newline="") as f:
+        if not path.endswith(".csv"):
+            return [json.loads(line) for line in f if line.strip()]
+        records = {}
+        for row in csv.DictReader(f):
+            record = records.setdefault((row["run"], row["elapsed"]),
+                                        {"run": row["run"], "elapsed": float(row["elapsed"])})
+            record[row["name"]] = float(row["value"])
+        return list(records.values())
+
+
+def find_latest_run(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Finds the records of the last run, since a resumed run appends to the metrics file of the previous runs.
+    """
+    latest_run = records[-1].get("run")
+    return [record for record in records if record.get("run") == latest_run]
+
+
+def summarize(records: List[Dict[str, Any]]) -> str:
+    """Summarizes where the training time went, the average throughput, the loss, and the memory growth.
+    Background saves and checkpoint writes overlap the other phases, so the shares may add up to more than 100%.
+    """
+    first = records[0]
+    last = records[-1]
+    elapsed = last["elapsed"]
+    lines = ["Elapsed: " + "{:.1f}".format(elapsed) + " s", "", "Phase | Time (s) | Share"]
+    for name, label in TIMERS:
+        if "time/" + name in last:
+            seconds = last["time/" + name]
+            lines.append(label + " | " + "{:.1f}".format(seconds) + " | " + "{:.1%}".format(seconds / elapsed))
+    lines.append("")
+    for name in ("games", "samples", "batches", "moves"):
+        if "count/" + name in last:
+            lines.append(name.capitalize() + ": " + str(int(last["count/" + name])) + " (" +
+                         "{:.1f}".format(last["count/" + name] / elapsed) + "/s)")
+    if "loss" in last:
+        lines.append("Loss: " + "{:.4f}".format(first.get("loss", last["loss"])) + " -> " +
+                     "{:.4f}".format(last["loss"]))
+    if "max_rss_mb" in last:
+        lines.append("Peak memory: " + "{:.0f}".format(first["max_rss_mb"]) + " MB -> " +
+                     "{:.0f}".format(last["max_rss_mb"]) + " MB")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    """Shows where the training time went in the latest run, given the metrics file written by
+    dqn_train.py --metrics=PATH.
+    """
+    if len(sys.argv) != 2:
+        print("Usage: python metrics_report.py PATH")
+    else:
+        training_records = read_records(sys.argv[1])
+        print(summarize(find_latest_run(training_records)) if training_records else "No metrics recorded.")
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
 import random
+import time
 from typing import Optional
 
+from keras import backend as K
 from keras.layers import Conv2D, Dense, Flatten
 from keras.models import Sequential, load_model
 from keras.optimizers import Adam
 
 import players.dqn_player as dp
+from players.dqn_checkpoint import CheckpointManager
+from players.dqn_metrics import NullMetrics
+from players.dqn_pipeline import DQNInputPipeline
 from players.dqn_util import *
 from game import UltimateTicTacToe
 
@@ -15,7 +20,8 @@ from game import UltimateTicTacToe
 class DQN:
     ADAM_LR = 3e-4
 
-    def __init__(self, dim: int, load: bool, model_dir: Optional[str] = None):
+    def __init__(self, dim: int, load: bool, model_dir: Optional[str] = None, cache_entries: int = 4096,
+                 cache_bytes: Optional[int] = None):
         self.dim = dim
         self.model_dir = model_dir
         self.input_shape = (self.dim ** 2, self.dim ** 2, 2)
@@ -24,6 +30,7 @@ class DQN:
             self.model = load_model(self.model_dir)
         else:
             self.model = self._construct()
+        self.cache = EvaluationCache(cache_entries, cache_bytes)
         print(self.model.summary())
 
     def _construct(self):
@@ -47,23 +54,52 @@ class DQN:
 
     def set_weights(self, weights) -> None:
         self.model.set_weights(weights)
+        self.cache.clear()
+
+    def get_optimizer_weights(self):
+        return self.model.optimizer.get_weights()
+
+    def set_optimizer_weights(self, weights) -> None:
+        """Restores the optimizer state. The optimizer creates its slots lazily, so a zero-gradient step is applied
+        first (which leaves the Adam moments and the model weights unchanged) before overwriting them.
+        """
+        if not self.model.optimizer.get_weights():
+            variables = self.model.trainable_weights
+            self.model.optimizer.apply_gradients(zip([K.zeros_like(v) for v in variables], variables))
+        self.model.optimizer.set_weights(weights)
 
     def evaluate(self, state: UltimateTicTacToe, to_board: bool = True):
-        dqn_input = convert_board_to_dqn_input(self.dim, state)
-        dqn_output = self.model.predict(dqn_input)
+        """Evaluates the state with the network, reusing the output for positions that were already evaluated
+        with the current weights. The returned output is a copy, so callers may modify it.
+        """
+        key = hash_position(state)
+        dqn_output = self.cache.get(key)
+        if dqn_output is None:
+            dqn_input = convert_board_to_dqn_input(self.dim, state)
+            dqn_output = self.model.predict(dqn_input)
+            self.cache.put(key, dqn_output)
         if to_board:
             return convert_dqn_output_to_board(self.dim, dqn_output)
-        return dqn_output
+        return dqn_output.copy()
+
+    def evaluate_batch(self, dqn_inputs: np.ndarray) -> np.ndarray:
+        return np.array(self.model.predict_on_batch(dqn_inputs))
 
-    def train(self, input_frames, q_truths) -> None:
-        self.model.train_on_batch(input_frames, q_truths)
+    def train(self, input_frames, q_truths) -> float:
+        """Trains on a batch and returns the loss.
+        """
+        outputs = self.model.train_on_batch(input_frames, q_truths)
+        self.cache.clear()
+        return float(outputs[0] if isinstance(outputs, list) else outputs)
 
     def save(self) -> None:
         self.model.save(self.model_dir)
 
 
 class DQNTrainer:
-    def __init__(self, epochs: int, epsilon: float, dim: int, target: DQN):
+    def __init__(self, epochs: int, epsilon: float, dim: int, target: DQN,
+                 checkpoint_dir: Optional[str] = None, checkpoint_every: int = 8,
+                 pipeline: bool = False, augment: bool = True, metrics=None):
         self.epochs = epochs
         self.epsilon = epsilon
         self.dim = dim
@@ -72,54 +108,177 @@ class DQNTrainer:
         self.batch_i = 0
         self.batch_size = 64
         self.history = deque()
-        self.buffer = ReplayBuffer(capacity=self.batch_size)
         self.gamma = 0.99
+        if pipeline:
+            self.buffer = ReplayMemory(capacity=64 * self.batch_size)
+            self.pipeline = DQNInputPipeline(self.buffer, dim, self.batch_size, augment=augment)
+        else:
+            self.buffer = ReplayBuffer(capacity=self.batch_size)
+            self.pipeline = None
+        self.new_samples = 0
+        self.step_time = 0.0
+        self.games = 0
         self.target = target
+        self.checkpoint_every = checkpoint_every
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        self.checkpointer = CheckpointManager(checkpoint_dir, metrics=self.metrics)
 
     def record_move(self, move) -> None:
         self.history.append(move)
 
     def update(self):
         action_i = random.randrange(len(self.history))
-        game = UltimateTicTacToe(verbose=False)
+        game = UltimateTicTacToe(dim=self.dim, verbose=False)
         for _ in range(action_i):
             game.update(self.history.popleft())
         self.buffer.push((game, self.history.popleft()))
         self.history.clear()
+        self.new_samples += 1
+        self.games += 1
+        self.metrics.count("games")
 
     def update_model(self, model: DQN):
-        dqn_inputs = []
-        q_truths = []
-        while not self.buffer.is_empty():
-            curr_state, move = self.buffer.pop()
-            dqn_input = convert_board_to_dqn_input(self.dim, curr_state)
-            dqn_inputs.append(dqn_input)
-            q_truth = model.evaluate(curr_state, to_board=False)
-            next_state = curr_state.clone()
-            next_state.update(move)
-            index = (self.dim ** 2) * move[0] + move[1]
-            if next_state.is_game_over():
-                winner = next_state.get_winner() * curr_state.get_curr_player()
-                q_truth[0][index] = winner
-            else:
-                _, next_q_val = dp.DeepQLearningPlayer.find_q_move(self.target, next_state)
-                q_truth[0][index] = self.gamma * next_q_val * -1
-            q_truths.append(q_truth)
-
-        dqn_inputs = np.concatenate(dqn_inputs)
-        q_truths = np.concatenate(q_truths, axis=0)
-        model.train(dqn_inputs, q_truths)
+        start_time = time.perf_counter()
+        if self.pipeline is not None:
+            loss = self._train_from_pipeline(model)
+        else:
+            loss = self._train_from_buffer(model)
+        self.step_time += time.perf_counter() - start_time
+        self.new_samples = 0
         self.batch_i += 1
+        self.metrics.count("batches")
+        self.metrics.count("samples", self.batch_size)
+        self.metrics.set("loss", loss)
+        self.metrics.set("replay_size", len(self.buffer.buffer))
+        self.metrics.set("cache_hit_rate", model.cache.get_hit_rate())
         if self.batch_i == self.batches:
+            with self.metrics.time("checkpoint_wait"):
+                self.checkpointer.wait()  # the previous export must finish before the target weights change
             self.target.set_weights(model.get_weights())
-            self.target.save()
+            self.checkpointer.export(self.target.save)
             self.epoch_i += 1
             print("Epoch " + str(self.epoch_i) + " is complete.")
+            self._report_step_time()
+            print("Model " + model.cache.summarize(self.games))
+            print("Target " + self.target.cache.summarize(self.games))
             self.batch_i = 0
-            if self.epoch_i == self.epochs:
-                print("Training is complete.")
+        step = self.epoch_i * self.batches + self.batch_i
+        self.metrics.set("epoch", self.epoch_i)
+        self.metrics.set("batch", self.batch_i)
+        is_checkpoint_step = step % self.checkpoint_every == 0 or self.is_training_complete()
+        if self.checkpointer.is_enabled() and is_checkpoint_step:  # the state is only copied if it will be written
+            with self.metrics.time("snapshot"):
+                self.checkpointer.snapshot(step, self.get_state(model))
+        if self.is_training_complete():
+            with self.metrics.time("checkpoint_wait"):
+                self.checkpointer.close()
+            print("Training is complete.")
+
+    def _train_from_buffer(self, model: DQN) -> float:
+        """Trains on the freshly buffered samples, evaluating the targets one state at a time.
+        """
+        dqn_inputs = []
+        q_truths = []
+        with self.metrics.time("target_computation"):
+            while not self.buffer.is_empty():
+                curr_state, move = self.buffer.pop()
+                dqn_input = convert_board_to_dqn_input(self.dim, curr_state)
+                dqn_inputs.append(dqn_input)
+                q_truth = model.evaluate(curr_state, to_board=False)
+                next_state = curr_state.clone()
+                next_state.update(move)
+                index = (self.dim ** 2) * move[0] + move[1]
+                if next_state.is_game_over():
+                    winner = next_state.get_winner() * curr_state.get_curr_player()
+                    q_truth[0][index] = winner
+                else:
+                    _, next_q_val = dp.DeepQLearningPlayer.find_q_move(self.target, next_state)
+                    q_truth[0][index] = self.gamma * next_q_val * -1
+                q_truths.append(q_truth)
+
+        dqn_inputs = np.concatenate(dqn_inputs)
+        q_truths = np.concatenate(q_truths, axis=0)
+        with self.metrics.time("train_on_batch"):
+            return model.train(dqn_inputs, q_truths)
+
+    def _train_from_pipeline(self, model: DQN) -> float:
+        """Trains on a prefetched batch sampled from the replay memory, evaluating the targets for the whole batch
+        at once. The value of the next state is the best value of the target model over the valid moves.
+        """
+        with self.metrics.time("input_wait"):
+            dqn_inputs, next_inputs, actions, rewards, dones, next_masks = self.pipeline.next_batch()
+        with self.metrics.time("target_computation"):
+            q_truths = model.evaluate_batch(dqn_inputs)
+            next_q_vals = self.target.evaluate_batch(next_inputs)
+            next_q_vals = np.where(next_masks, next_q_vals, float("-inf")).max(axis=1)
+            next_q_vals = np.where(dones, 0, next_q_vals)  # game-over states have no valid moves
+            q_truths[np.arange(len(actions)), actions] = np.where(dones, rewards, self.gamma * next_q_vals * -1)
+        with self.metrics.time("train_on_batch"):
+            return model.train(dqn_inputs, q_truths)
+
+    def _report_step_time(self) -> None:
+        """Prints the average training step time of the epoch and the share of it spent waiting for input.
+        """
+        step_ms = 1000 * self.step_time / self.batches
+        message = "Step time: " + "{:.1f}".format(step_ms) + " ms"
+        if self.pipeline is not None:
+            wait_ms = 1000 * self.pipeline.wait_time / self.batches
+            message += ", input wait: " + "{:.1f}".format(wait_ms) + " ms (" + \
+                       "{:.0%}".format(wait_ms / step_ms if step_ms > 0 else 0) + ")"
+            self.pipeline.wait_time = 0.0
+        print(message)
+        self.step_time = 0.0
+
+    def get_state(self, model: DQN):
+        """Snapshots everything needed to resume training exactly: weights, optimizer state, counters,
+        random number generator states, and the buffered experience. The weights are copies and the buffered games
+        are never modified once pushed, so the snapshot can be written in the background while training continues.
+        """
+        return {
+            "model_weights": model.get_weights(),
+            "target_weights": self.target.get_weights(),
+            "optimizer_weights": model.get_optimizer_weights(),
+            "epoch_i": self.epoch_i,
+            "batch_i": self.batch_i,
+            "random_state": random.getstate(),
+            "np_random_state": np.random.get_state(),
+            "history": list(self.history),
+            "buffer": list(self.buffer.buffer),
+            "pipeline": self.pipeline.get_state() if self.pipeline is not None else None,
+        }
+
+    def set_state(self, model: DQN, state) -> None:
+        model.set_weights(state["model_weights"])
+        model.set_optimizer_weights(state["optimizer_weights"])
+        self.target.set_weights(state["target_weights"])
+        self.epoch_i = state["epoch_i"]
+        self.batch_i = state["batch_i"]
+        random.setstate(state["random_state"])
+        np.random.set_state(state["np_random_state"])
+        self.history = deque(state["history"])
+        self.buffer.replace(state["buffer"])
+        if self.pipeline is not None and state.get("pipeline") is not None:
+            self.pipeline.set_state(state["pipeline"])
+
+    def resume(self, model: DQN) -> bool:
+        """Restores the latest checkpoint, if any. Returns whether training was resumed.
+        """
+        state = self.checkpointer.load_latest()
+        if state is None:
+            return False
+        self.set_state(model, state)
+        print("Resumed from epoch " + str(self.epoch_i) + ", batch " + str(self.batch_i) + ".")
+        if self.is_training_complete():
+            print("The checkpoint already completed " + str(self.epoch_i) + " of " + str(self.epochs) +
+                  " epochs, so there is nothing left to train.")
+        return True
 
     def is_buffer_full(self) -> bool:
+        """Determines whether a batch is ready. With the input pipeline, a batch is ready once a batch worth of
+        new samples has been added to the replay memory since the last training step.
+        """
+        if self.pipeline is not None:
+            return self.new_samples >= self.batch_size and len(self.buffer) >= self.batch_size
         return self.buffer.is_full()
 
     def is_epsilon_greedy(self) -> bool:
@@ -128,4 +287,4 @@ class DQNTrainer:
         return False
 
     def is_training_complete(self):
-        return self.epoch_i == self.epochs
+        return self.epoch_i >= self.epochs
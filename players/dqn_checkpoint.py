@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import os
+import pickle
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from players.dqn_metrics import NullMetrics
+
+
+class CheckpointManager:
+    """Writes training checkpoints and model exports on a background thread so that the training loop
+    only pays for taking an in-memory snapshot, not for the disk writes.
+    """
+    PREFIX = "ckpt-"
+    SUFFIX = ".pkl"
+
+    def __init__(self, checkpoint_dir: Optional[str] = None, keep: int = 3, metrics=None):
+        self.checkpoint_dir = checkpoint_dir
+        self.keep = keep
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        self.jobs = queue.Queue()
+        self.error = None
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+        if self.checkpoint_dir is not None:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+    def is_enabled(self) -> bool:
+        """Determines whether snapshots of the training state are written.
+        """
+        return self.checkpoint_dir is not None
+
+    def export(self, save: Callable[[], None]) -> None:
+        """Queues a model export, e.g. the SavedModel written by DQN.save.
+        """
+        self._submit("save", save)
+
+    def snapshot(self, step: int, state: Dict[str, Any]) -> None:
+        """Queues a checkpoint of the training state. The state must already be a copy
+        that the training loop will not mutate afterwards.
+        """
+        if self.checkpoint_dir is None:
+            return
+        self._submit("checkpoint_write", lambda: self._write(step, state))
+
+    def wait(self) -> None:
+        """Blocks until every queued job has been written, re-raising the first error of the worker.
+        """
+        self.jobs.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def close(self) -> None:
+        self.wait()
+        self.jobs.put(None)
+        self.worker.join()
+
+    def list_checkpoints(self) -> List[str]:
+        if self.checkpoint_dir is None or not os.path.isdir(self.checkpoint_dir):
+            return []
+        names = [name for name in os.listdir(self.checkpoint_dir)
+                 if name.startswith(self.PREFIX) and name.endswith(self.SUFFIX)]
+        return [os.path.join(self.checkpoint_dir, name) for name in sorted(names)]
+
+    def load_latest(self) -> Optional[Dict[str, Any]]:
+        """Loads the most recent checkpoint, or None if there is none.
+        """
+        checkpoints = self.list_checkpoints()
+        if not checkpoints:
+            return None
+        with open(checkpoints[-1], "rb") as f:
+            return pickle.load(f)
+
+    def _submit(self, name: str, job: Callable[[], None]) -> None:
+        if not self.worker.is_alive():
+            raise RuntimeError("checkpoint manager is closed")
+        self.jobs.put((name, job))
+
+    def _run(self) -> None:
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                name, run_job = job
+                with self.metrics.time(name):  # time spent writing in the background
+                    run_job()
+            except Exception as e:  # surfaced to the training loop on the next wait()
+                if self.error is None:
+                    self.error = e
+            finally:
+                self.jobs.task_done()
+
+    def _write(self, step: int, state: Dict[str, Any]) -> None:
+        """Writes the checkpoint atomically and removes all but the newest checkpoints.
+        """
+        path = os.path.join(self.checkpoint_dir, self.PREFIX + "{:08d}".format(step) + self.SUFFIX)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        for old_path in self.list_checkpoints()[:-self.keep]:
+            os.remove(old_path)
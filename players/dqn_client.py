@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import socket
+from typing import Optional
+
+from players.dqn_util import *
+
+
+def recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    """Receives exactly size bytes, or None if the connection was closed.
+    """
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data.extend(chunk)
+    return bytes(data)
+
+
+class DQNClient:
+    """Evaluates positions through a DQNInferenceServer. It can stand in for a DQN wherever only evaluate is used.
+    """
+    def __init__(self, dim: int = 3, host: str = "localhost", port: int = 5757):
+        self.dim = dim
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def get_dim(self):
+        return self.dim
+
+    def evaluate(self, state: UltimateTicTacToe, to_board: bool = True):
+        self.sock.sendall(hash_position(state))
+        data = recv_exact(self.sock, 4 * self.dim ** 4)
+        if data is None:
+            raise ConnectionError("the inference server closed the connection")
+        dqn_output = np.frombuffer(data, dtype=np.float32).reshape(1, self.dim ** 4).copy()
+        if to_board:
+            return convert_dqn_output_to_board(self.dim, dqn_output)
+        return dqn_output
+
+    def close(self) -> None:
+        self.sock.close()
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import csv
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start_time")
+
+    def __init__(self, metrics: TrainingMetrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        elapsed = time.perf_counter() - self.start_time
+        with self.metrics.lock:  # timers also run on the background checkpoint thread
+            self.metrics.times[self.name] += elapsed
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullMetrics:
+    """Stands in for TrainingMetrics when metrics are disabled, so that instrumented code costs next to nothing.
+    """
+    def time(self, name: str) -> _NullTimer:
+        return _NULL_TIMER
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def set(self, name: str, value: float) -> None:
+        pass
+
+    def tick(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class TrainingMetrics:
+    """Accumulates timers, counters, and gauges, and periodically appends them to a JSONL file (or, for a path ending
+    in .csv, a CSV file with one row per metric) and optionally to TensorBoard event files. Timers and counters are
+    cumulative since the start of the run, and the rate of each counter over the last interval is added. Each record
+    is tagged with the start time of the run, since a resumed run appends to the same file.
+    """
+    def __init__(self, path: str, interval: float = 10.0, tensorboard_dir: Optional[str] = None):
+        self.path = path
+        self.interval = interval
+        self.run = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.lock = threading.Lock()
+        self.times = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.gauges = {}
+        self.last_counts = {}
+        self.start_time = time.perf_counter()
+        self.last_flush_time = self.start_time
+        self.flushes = 0
+        self.file = open(self.path, "a", newline="")
+        self.csv_writer = csv.writer(self.file) if self.path.endswith(".csv") else None
+        if self.csv_writer is not None and self.file.tell() == 0:
+            self.csv_writer.writerow(["run", "elapsed", "name", "value"])
+        if tensorboard_dir is not None:
+            import tensorflow as tf
+            self.summary_writer = tf.summary.create_file_writer(tensorboard_dir)
+        else:
+            self.summary_writer = None
+
+    def time(self, name: str) -> _Timer:
+        """Times the enclosed block, e.g. with metrics.time("train_on_batch"): ...
+        """
+        return _Timer(self, name)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counts[name] += n
+
+    def set(self, name: str, value: float) -> None:
+        self.gauges[name] = value
+
+    def tick(self) -> None:
+        """Writes the metrics if the interval has passed since they were last written.
+        """
+        if time.perf_counter() - self.last_flush_time >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        now = time.perf_counter()
+        record = self.get_record(now)
+        if self.csv_writer is not None:
+            for name, value in record.items():
+                if name not in ("run", "elapsed"):
+                    self.csv_writer.writerow([self.run, record["elapsed"], name, value])
+        else:
+            self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        if self.summary_writer is not None:
+            import tensorflow as tf
+            with self.summary_writer.as_default():
+                for name, value in record.items():
+                    if name != "run":
+                        tf.summary.scalar(name, value, step=self.flushes)
+            self.summary_writer.flush()
+        self.last_counts = dict(self.counts)
+        self.last_flush_time = now
+        self.flushes += 1
+
+    def get_record(self, now: float) -> Dict[str, Any]:
+        interval = max(now - self.last_flush_time, 1e-9)
+        record = {"run": self.run, "elapsed": now - self.start_time}
+        for name, value in self.counts.items():
+            record["count/" + name] = value
+            record["rate/" + name] = (value - self.last_counts.get(name, 0)) / interval
+        with self.lock:
+            times = dict(self.times)
+        for name, value in times.items():
+            record["time/" + name] = value
+        record.update(self.gauges)
+        max_rss = find_max_rss_mb()
+        if max_rss is not None:
+            record["max_rss_mb"] = max_rss
+        return record
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+
+
+def find_max_rss_mb() -> Optional[float]:
+    """Finds the peak resident memory of the process in megabytes, if the platform reports it.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 2 ** 20 if sys.platform == "darwin" else max_rss / 2 ** 10  # bytes on macOS, kilobytes elsewhere
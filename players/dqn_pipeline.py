@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import tensorflow as tf
+
+from players.dqn_util import ReplayMemory
+
+
+def find_symmetries(dim: int) -> np.ndarray:
+    """Finds the eight rotations and reflections of the board as permutations of the flattened board indices
+    (dim ** 2 * miniboard index + square index). The same transformation is applied to the maxiboard
+    and to every miniboard, which preserves the rules of the game.
+    """
+    def transforms(r: int, c: int) -> List[Tuple[int, int]]:
+        n = dim - 1
+        return [(r, c), (c, n - r), (n - r, n - c), (n - c, r), (r, n - c), (n - r, c), (c, r), (n - c, n - r)]
+
+    symmetries = np.zeros(shape=(8, dim ** 4), dtype=np.int32)
+    for mini_i in range(dim ** 2):
+        mini_ts = transforms(mini_i // dim, mini_i % dim)
+        for square_i in range(dim ** 2):
+            square_ts = transforms(square_i // dim, square_i % dim)
+            for k in range(8):
+                new_mini_i = dim * mini_ts[k][0] + mini_ts[k][1]
+                new_square_i = dim * square_ts[k][0] + square_ts[k][1]
+                symmetries[k][(dim ** 2) * mini_i + square_i] = (dim ** 2) * new_mini_i + new_square_i
+    return symmetries
+
+
+def find_grid_indices(dim: int) -> np.ndarray:
+    """Finds the flattened board index shown at each (y, x) cell of the network input,
+    matching the layout of convert_board_to_dqn_input.
+    """
+    grid_indices = np.zeros(shape=(dim ** 2, dim ** 2), dtype=np.int32)
+    for mini_i in range(dim ** 2):
+        for square_i in range(dim ** 2):
+            x = dim * (mini_i % dim) + square_i % dim
+            y = dim * (mini_i // dim) + square_i // dim
+            grid_indices[y][x] = (dim ** 2) * mini_i + square_i
+    return grid_indices
+
+
+class DQNInputPipeline:
+    """Streams training batches from a replay memory with tf.data. Python only samples transitions and plays the
+    sampled move; encoding and symmetry augmentation run as parallel map stages, and the next batches are prefetched
+    while the current batch trains. Each element holds the encoded state, the encoded next state, the action index,
+    the reward for the player who moved, whether the game ended, and the valid moves of the next state.
+
+    The augmentation of each sample is seeded by the pipeline seed and the index of the sample, and the transitions
+    drawn ahead of training are kept until their batch is consumed, so that the pipeline can be resumed at the first
+    sample that has not been trained on with the same transitions, even though the replay memory has changed since.
+    """
+    def __init__(self, memory: ReplayMemory, dim: int, batch_size: int, augment: bool = True, prefetch: int = 2,
+                 seed: Optional[int] = None):
+        self.memory = memory
+        self.dim = dim
+        self.batch_size = batch_size
+        self.augment = augment
+        self.seed = seed if seed is not None else random.randrange(2 ** 31)
+        self.symmetries = tf.constant(find_symmetries(dim))
+        self.inverse_symmetries = tf.constant(np.argsort(find_symmetries(dim), axis=1).astype(np.int32))
+        self.grid_indices = tf.constant(find_grid_indices(dim).reshape(-1))
+        self.prefetch = prefetch
+        self.dataset = self._construct(prefetch)
+        self.iterator = None  # created on the first batch, once the replay memory has samples
+        self.produced = 0
+        self.consumed = 0
+        self.prefetched = deque()  # transitions drawn but not yet trained on, from the sample at index consumed
+        self.restored = deque()  # prefetched transitions of a restored state, drawn again before sampling resumes
+        self.lock = threading.Lock()  # guards the sampler, which runs on a tf.data thread
+        self.wait_time = 0.0
+
+    def next_batch(self):
+        """Gets the next batch as NumPy arrays, recording the time spent waiting for it.
+        """
+        start_time = time.perf_counter()
+        if self.iterator is None:
+            self.iterator = iter(self.dataset)
+        batch = next(self.iterator)
+        self.wait_time += time.perf_counter() - start_time
+        with self.lock:
+            self.consumed += self.batch_size
+            for _ in range(self.batch_size):
+                self.prefetched.popleft()
+        return [tensor.numpy() for tensor in batch]
+
+    def get_state(self) -> Dict[str, Any]:
+        """Snapshots the seed, the transitions drawn past the consumed samples, and the sampler state after them.
+        The stored games are never modified, so the transitions are not copied.
+        """
+        with self.lock:
+            return {"seed": self.seed, "consumed": self.consumed,
+                    "prefetched": list(self.prefetched) + list(self.restored),
+                    "sampler_state": self.memory.random_gen.getstate()}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        """Restores a snapshot. It must be restored before the first batch, since batches already prefetched
+        from the previous state are discarded.
+        """
+        with self.lock:
+            self.seed = state["seed"]
+            self.consumed = state["consumed"]
+            self.produced = state["consumed"]
+            self.prefetched.clear()
+            self.restored = deque(state["prefetched"])
+            self.memory.random_gen.setstate(state["sampler_state"])
+        self.dataset = self._construct(self.prefetch)  # the seed is captured when the map functions are traced
+        self.iterator = None
+
+    def _construct(self, prefetch: int) -> tf.data.Dataset:
+        squares = self.dim ** 4
+        output_types = (tf.int64, tf.int8, tf.int8, tf.int8, tf.int8, tf.int32, tf.float32, tf.bool, tf.bool)
+        output_shapes = ((), (squares,), (), (squares,), (), (), (), (), (squares,))
+        dataset = tf.data.Dataset.from_generator(self._generate, output_types, output_shapes)
+        if self.augment:
+            dataset = dataset.map(self._augment, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+        dataset = dataset.map(self._encode, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+        return dataset.batch(self.batch_size).prefetch(prefetch)
+
+    def _generate(self):
+        """Samples transitions from the replay memory and plays the sampled moves.
+        """
+        while True:
+            with self.lock:
+                sample_i = self.produced
+                curr_state, move = self.restored.popleft() if self.restored else self.memory.sample()
+                self.prefetched.append((curr_state, move))
+                self.produced += 1
+            next_state = curr_state.clone()
+            next_state.update(move)
+            _, valid_moves = next_state.get_valid_miniboards_and_moves()
+            next_mask = np.zeros(self.dim ** 4, dtype=np.bool_)
+            for next_move in valid_moves:
+                next_mask[(self.dim ** 2) * next_move[0] + next_move[1]] = True
+            yield (np.int64(sample_i),
+                   np.array(curr_state.get_board(), dtype=np.int8).reshape(-1),
+                   np.int8(curr_state.get_curr_player()),
+                   np.array(next_state.get_board(), dtype=np.int8).reshape(-1),
+                   np.int8(next_state.get_curr_player()),
+                   np.int32((self.dim ** 2) * move[0] + move[1]),
+                   np.float32(next_state.get_winner() * curr_state.get_curr_player()),
+                   next_state.is_game_over(),
+                   next_mask)
+
+    def _augment(self, sample_i, board, player, next_board, next_player, action, reward, done, next_mask):
+        """Applies a random rotation or reflection to the boards, the action, and the valid moves.
+        """
+        seed = tf.stack([tf.constant(self.seed, dtype=tf.int64), sample_i])
+        k = tf.random.stateless_uniform((), seed=seed, maxval=8, dtype=tf.int32)
+        inverse = self.inverse_symmetries[k]
+        return (sample_i, tf.gather(board, inverse), player, tf.gather(next_board, inverse), next_player,
+                self.symmetries[k][action], reward, done, tf.gather(next_mask, inverse))
+
+    def _encode(self, sample_i, board, player, next_board, next_player, action, reward, done, next_mask):
+        return (self._encode_board(board, player), self._encode_board(next_board, next_player),
+                action, reward, done, next_mask)
+
+    def _encode_board(self, board, player):
+        """Converts a flattened board to the network input, equivalent to convert_board_to_dqn_input.
+        """
+        grid = tf.reshape(tf.gather(board, self.grid_indices), (self.dim ** 2, self.dim ** 2))
+        planes = tf.stack([tf.cast(tf.equal(grid, player), tf.float32),
+                           tf.cast(tf.equal(grid, -player), tf.float32)], axis=-1)
+        return planes * tf.cast(player, tf.float32)
@@ -1,21 +1,39 @@
 from __future__ import annotations
 
 from players.dqn import *
+from players.dqn_client import DQNClient
 from players.player import Move, Player
 
 
+def find_model_dir(dim: int) -> str:
+    """Finds the default directory of the network for boards of the given dimension.
+    """
+    return "dqn_model" if dim == 3 else "dqn_model_" + str(dim)
+
+
 class DeepQLearningPlayer(Player):
     IS_HUMAN = False
 
-    def __init__(self, load: bool = True, token: Optional[str] = None, model_dir: str = "dqn_model",
-                 dim: int = 3, train: bool = False, epochs: int = 100, epsilon: float = 0.2):
+    def __init__(self, load: bool = True, token: Optional[str] = None, model_dir: Optional[str] = None,
+                 dim: int = 3, train: bool = False, epochs: int = 100, epsilon: float = 0.2,
+                 checkpoint_dir: Optional[str] = None, resume: bool = False, pipeline: bool = False,
+                 server: Optional[Tuple[str, int]] = None, metrics=None, augment: bool = True):
         super().__init__(token)
-        self.model_dir = model_dir
-        self.model = DQN(dim, load, model_dir=self.model_dir)
+        if train and server is not None:
+            raise ValueError("a player that evaluates through an inference server cannot be trained")
+        self.model_dir = model_dir if model_dir is not None else find_model_dir(dim)
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        if server is not None:  # client mode: positions are evaluated by a shared DQNInferenceServer
+            self.model = DQNClient(dim, *server)
+        else:
+            self.model = DQN(dim, load, model_dir=self.model_dir)
         if train:
             target = DQN(dim, load, model_dir=self.model_dir)
             target.set_weights(self.model.get_weights())
-            self.trainer = DQNTrainer(epochs, epsilon, dim, target)
+            self.trainer = DQNTrainer(epochs, epsilon, dim, target, checkpoint_dir=checkpoint_dir,
+                                      pipeline=pipeline, augment=augment, metrics=self.metrics)
+            if resume:
+                self.trainer.resume(self.model)
         else:
             self.trainer = None
 
@@ -23,11 +41,13 @@ class DeepQLearningPlayer(Player):
         """Chooses an appropriate move for the player, either the best-value move for the player or a random move
         if the player is exploring under epsilon-greedy training. Records the move if the player is training.
         """
-        if self.trainer is not None and self.trainer.is_epsilon_greedy():
-            _, valid_moves = game.get_valid_miniboards_and_moves()
-            selected_move = random.choice(valid_moves)
-        else:
-            selected_move, _ = self.find_q_move(self.model, game)
+        with self.metrics.time("move_selection"):
+            if self.trainer is not None and self.trainer.is_epsilon_greedy():
+                _, valid_moves = game.get_valid_miniboards_and_moves()
+                selected_move = random.choice(valid_moves)
+            else:
+                selected_move, _ = self.find_q_move(self.model, game)
+        self.metrics.count("moves")
         if self.trainer is not None:
             self.trainer.record_move(selected_move)
         return selected_move
@@ -40,6 +60,7 @@ class DeepQLearningPlayer(Player):
         self.trainer.update()
         if self.trainer.is_buffer_full():
             self.trainer.update_model(self.model)
+        self.metrics.tick()
 
     def is_training_complete(self) -> bool:
         return self.trainer.is_training_complete()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import queue
+import socket
+import socketserver
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from players.dqn_client import recv_exact
+from players.dqn_util import *
+
+if TYPE_CHECKING:
+    from players.dqn import DQN
+
+
+class _Request:
+    def __init__(self, key: bytes):
+        self.key = key
+        self.output = None
+        self.done = threading.Event()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        """Answers the position keys sent on the connection with the network outputs, one at a time.
+        """
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        service = self.server.service
+        while True:
+            key = recv_exact(self.request, service.dim ** 4 + 1)
+            if key is None:
+                return
+            dqn_output = service.evaluate_key(key)
+            if dqn_output is None:
+                return
+            self.request.sendall(dqn_output.astype(np.float32).tobytes())
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class DQNInferenceServer:
+    """Serves a single copy of the network to many concurrent games over a local socket. Requests from all connections
+    are collected into batches of at most max_batch_size positions, waiting at most max_wait seconds after the first
+    request of a batch, so that one forward pass answers many callers.
+    """
+    def __init__(self, dim: int = 3, model_dir: str = "dqn_model", host: str = "localhost", port: int = 5757,
+                 max_batch_size: int = 32, max_wait: float = 0.002, model: Optional[DQN] = None):
+        from players.dqn import DQN  # imported here since players.dqn imports the player, which imports the client
+        self.dim = dim
+        self.model = model if model is not None else DQN(dim, True, model_dir=model_dir)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.stopped = False
+        self.stop_lock = threading.Lock()
+        self.batches = 0
+        self.batched_requests = 0
+        self.server = _Server((host, port), _Handler)
+        self.server.service = self
+        self.batcher = threading.Thread(target=self._run_batches, daemon=True)
+        self.listener = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def get_address(self):
+        return self.server.server_address
+
+    def start(self) -> None:
+        self.batcher.start()
+        self.listener.start()
+
+    def stop(self) -> None:
+        """Stops serving. Requests still queued behind the current batch fail, which closes their connections.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        with self.stop_lock:
+            self.stopped = True
+            self.requests.put(None)
+        self.batcher.join()
+        while not self.requests.empty():
+            request = self.requests.get()
+            if request is not None:
+                request.done.set()
+
+    def evaluate_key(self, key: bytes) -> np.ndarray:
+        """Queues a position for the next batch and waits for its output, which is None if the batch failed.
+        """
+        request = _Request(key)
+        with self.stop_lock:
+            if self.stopped:
+                return None
+            self.requests.put(request)
+        request.done.wait()
+        return request.output
+
+    def get_mean_batch_size(self) -> float:
+        return self.batched_requests / self.batches if self.batches > 0 else 0.0
+
+    def _run_batches(self) -> None:
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.requests.put(None)  # stop after answering this batch
+                    break
+                batch.append(request)
+            try:
+                dqn_inputs = np.concatenate([convert_squares_to_dqn_input(self.dim, *decode_position(self.dim, r.key))
+                                             for r in batch])
+                dqn_outputs = self.model.evaluate_batch(dqn_inputs)
+            except Exception as e:  # the connections of the failed batch are closed instead of hanging
+                print("Batch failed: " + repr(e))
+                dqn_outputs = [None] * len(batch)
+            self.batches += 1
+            self.batched_requests += len(batch)
+            for r, dqn_output in zip(batch, dqn_outputs):
+                r.output = dqn_output
+                r.done.set()
@@ -1,4 +1,7 @@
-from collections import deque
+import random
+import threading
+from collections import OrderedDict, deque
+from typing import Optional
 
 import numpy as np
 
@@ -16,6 +19,10 @@ class ReplayBuffer:
     def pop(self):
         return self.buffer.pop()
 
+    def replace(self, items) -> None:
+        self.buffer.clear()
+        self.buffer.extend(items)
+
     def is_full(self) -> bool:
         return len(self.buffer) == self.capacity
 
@@ -23,17 +30,113 @@ class ReplayBuffer:
         return len(self.buffer) == 0
 
 
+class ReplayMemory(ReplayBuffer):
+    """A replay buffer that keeps old experience and is sampled uniformly with replacement.
+    Sampling is thread-safe so that an input pipeline can draw from it while self-play pushes to it.
+    """
+    def __init__(self, capacity: int = 4096, seed: Optional[int] = None):
+        super().__init__(capacity)
+        self.lock = threading.Lock()
+        self.random_gen = random.Random(seed)
+
+    def push(self, info) -> None:
+        with self.lock:
+            self.buffer.append(info)
+
+    def replace(self, items) -> None:
+        with self.lock:
+            super().replace(items)
+
+    def sample(self):
+        with self.lock:
+            return self.buffer[self.random_gen.randrange(len(self.buffer))]
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+
+class EvaluationCache:
+    """A least-recently-used cache of network outputs keyed by position, bounded by an entry count and optionally
+    by the number of bytes held. It must be cleared whenever the network weights change.
+    """
+    def __init__(self, max_entries: int = 4096, max_bytes: Optional[int] = None):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: bytes, value: np.ndarray) -> None:
+        if self.max_entries == 0 or key in self.entries:
+            return
+        self.entries[key] = value
+        self.bytes += len(key) + value.nbytes
+        while len(self.entries) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            old_key, old_value = self.entries.popitem(last=False)
+            self.bytes -= len(old_key) + old_value.nbytes
+            self.evictions += 1
+
+    def clear(self) -> None:
+        if self.entries:
+            self.invalidations += 1
+        self.entries.clear()
+        self.bytes = 0
+
+    def get_hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def summarize(self, games: Optional[int] = None) -> str:
+        """Summarizes the hit rate and, given the number of games,
+        the forward passes per game with and without the cache.
+        """
+        message = "Cache hits: " + str(self.hits) + ", misses: " + str(self.misses) + \
+                  " (hit rate " + "{:.1%}".format(self.get_hit_rate()) + "), evictions: " + str(self.evictions) + \
+                  ", invalidations: " + str(self.invalidations)
+        if games:
+            message += ", forward passes per game: " + "{:.1f}".format(self.misses / games) + \
+                       " (" + "{:.1f}".format((self.hits + self.misses) / games) + " without cache)"
+        return message
+
+
+def hash_position(state: UltimateTicTacToe) -> bytes:
+    """Packs the squares and the current player, which fully determine the network input, into a compact key.
+    """
+    return bytes(s + 1 for miniboard in state.get_board() for s in miniboard) + bytes([state.get_curr_player() + 1])
+
+
+def decode_position(dim: int, key: bytes):
+    """Recovers the squares and the current player from a key made by hash_position.
+    """
+    board = [[s - 1 for s in key[mini_i * dim ** 2:(mini_i + 1) * dim ** 2]] for mini_i in range(dim ** 2)]
+    return board, key[-1] - 1
+
+
 def convert_board_to_dqn_input(dim: int, state: UltimateTicTacToe):
-    board = state.get_board()
-    curr_player = state.get_curr_player()
+    return convert_squares_to_dqn_input(dim, state.get_board(), state.get_curr_player())
+
+
+def convert_squares_to_dqn_input(dim: int, board, curr_player: int):
     arr_input = np.zeros(shape=(dim ** 2, dim ** 2, 2))
     for mini_i in range(dim ** 2):
         for square_i in range(dim ** 2):
             x = dim * (mini_i % dim) + square_i % dim
             y = dim * (mini_i // dim) + square_i // dim
-            if board[mini_i][square_i] == state.get_curr_player():
+            if board[mini_i][square_i] == curr_player:
                 arr_input[y][x][0] = 1
-            if board[mini_i][square_i] == state.get_curr_player() * -1:
+            if board[mini_i][square_i] == curr_player * -1:
                 arr_input[y][x][1] = 1
     return np.expand_dims(arr_input * curr_player, axis=0)
 
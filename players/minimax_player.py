@@ -3,18 +3,24 @@ from __future__ import annotations
 from math import log2
 from typing import List
 
+from players.move_ordering import MoveOrdering
 from players.player import *
 
 
 class MinimaxPlayer(Player):
     IS_HUMAN = False
 
-    def __init__(self, token: Optional[str] = None, depth: Optional[int] = None, dim: int = 3):
+    def __init__(self, token: Optional[str] = None, depth: Optional[int] = None, dim: int = 3,
+                 ordering: Optional[MoveOrdering] = None, order_moves: bool = True):
         super().__init__(token)
         self.depth = depth if depth is not None else None
         self.dim = dim
+        self.ordering = (ordering if ordering is not None else MoveOrdering()) if order_moves else None
         self.point_system = self._calculate_point_system()
         self.inf = sum(self.point_system) ** 2 + 1  # value greater than the maximum number of points possible
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
 
     def _calculate_point_system(self) -> List[int]:
         """Calculates a point system for each square based on the number of winning configurations
@@ -32,27 +38,34 @@ class MinimaxPlayer(Player):
         The default depth is the square root of the number of available squares plus one,
         which is used to avoid exploring an excessive number of game states at the start.
         """
-        depth = self.depth if self.depth is not None else int(log2(81 - game.get_squares_left() + 1)) + 1
+        depth = self.depth if self.depth is not None else int(log2(game.dim ** 4 - game.get_squares_left() + 1)) + 1
+        if self.ordering is not None:
+            self.ordering.start_search()
         _, move = self.apply_minimax_with_alpha_beta(game, (-1 * self.inf, None), (self.inf, None), depth)
         return move
 
     def apply_minimax_with_alpha_beta(self, game: UltimateTicTacToe, alpha: Tuple[int, Optional[Move]],
-                                      beta: Tuple[int, Optional[Move]], depth: int) -> Tuple[int, Optional[Move]]:
+                                      beta: Tuple[int, Optional[Move]], depth: int,
+                                      ply: int = 0) -> Tuple[int, Optional[Move]]:
         """Applies minimax with alpha-beta pruning to efficiently search for moves that lead to optimal game states,
         according to the evaluation function. If first, the player maximizes its minimum evaluation.
-        If second, the player minimizes its maximum evaluation.
+        If second, the player minimizes its maximum evaluation. The moves are searched in the order given by the
+        move ordering, if any, which is informed of every cutoff.
         """
+        self.nodes += 1
         if game.is_game_over() or depth == 0:
             return self.evaluate_state(game), None
 
         curr_player = game.get_curr_player()
         best_move = (-1 * curr_player * self.inf, None)
         _, moves = game.get_valid_miniboards_and_moves()
-        for move in moves:
+        if self.ordering is not None:
+            moves = self.ordering.order(game, moves, ply)
+        for move_i, move in enumerate(moves):
             clone = game.clone()
             clone.set_verbose(False)
             clone.update(move)
-            tmp = self.apply_minimax_with_alpha_beta(clone, alpha, beta, depth - 1)[0], move
+            tmp = self.apply_minimax_with_alpha_beta(clone, alpha, beta, depth - 1, ply + 1)[0], move
             if curr_player == 1:
                 if best_move[0] < tmp[0]:
                     best_move = tmp
@@ -64,6 +77,11 @@ class MinimaxPlayer(Player):
                 if beta[0] > best_move[0]:
                     beta = best_move
             if alpha[0] >= beta[0]:
+                self.cutoffs += 1
+                if move_i == 0:
+                    self.first_move_cutoffs += 1
+                if self.ordering is not None:
+                    self.ordering.record_cutoff(move, ply, depth)
                 break
         if curr_player == 1:
             return alpha
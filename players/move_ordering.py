@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import List
+
+from players.player import *
+
+
+class MoveOrdering:
+    """Orders the moves searched by alpha-beta pruning so that the moves most likely to cause a cutoff come first.
+    Moves are ranked by a cheap static score, then by whether they are killer moves (moves that recently caused
+    a cutoff at the same ply), then by the history table (how often and how deep the moves caused cutoffs).
+    Each heuristic can be disabled, and subclasses can override static_score to plug in other orderings.
+    """
+    def __init__(self, static: bool = True, killers: bool = True, history: bool = True, num_killers: int = 2):
+        self.static = static
+        self.killers = killers
+        self.history = history
+        self.num_killers = num_killers
+        self.killer_moves = defaultdict(list)
+        self.history_table = defaultdict(int)
+
+    def order(self, game: UltimateTicTacToe, moves: List[Move], ply: int) -> List[Move]:
+        killer_moves = self.killer_moves[ply] if self.killers else []
+        return sorted(moves, key=lambda move: (self.static_score(game, move) if self.static else 0,
+                                               move in killer_moves,
+                                               self.history_table[move] if self.history else 0), reverse=True)
+
+    def static_score(self, game: UltimateTicTacToe, move: Move) -> int:
+        """Scores a move without searching: claiming a miniboard is best, sending the opponent to a claimed miniboard
+        (where its move cannot claim anything) is good, and letting the opponent claim the miniboard it is sent to
+        or handing the opponent a free move is bad.
+        """
+        score = 0
+        if game.is_miniboard_winning_move(move):
+            score += 4
+        next_mini_i = move[1]
+        empty_squares = game.get_empty_squares(next_mini_i) - (1 if move[0] == next_mini_i else 0)
+        if empty_squares == 0:
+            score -= 2
+        elif game.get_maxiboard()[next_mini_i] != 0:
+            score += 1
+        elif game.can_win_miniboard(next_mini_i, -1 * game.get_curr_player()):
+            score -= 1
+        return score
+
+    def record_cutoff(self, move: Move, ply: int, depth: int) -> None:
+        """Records a move that caused a cutoff as a killer move for its ply and in the history table.
+        """
+        if self.killers:
+            killer_moves = self.killer_moves[ply]
+            if move not in killer_moves:
+                killer_moves.insert(0, move)
+                del killer_moves[self.num_killers:]
+        if self.history:
+            self.history_table[move] += depth ** 2
+
+    def start_search(self) -> None:
+        """Clears the killer moves, which are relative to the root, and ages the history table.
+        """
+        self.killer_moves.clear()
+        for move in self.history_table:
+            self.history_table[move] //= 2
@@ -4,3 +4,16 @@ from players.player import Player
 
 def is_curr_player_human(game: UltimateTicTacToe, p1: Player, p2: Player) -> bool:
     return (game.get_curr_player() == 1 and p1.IS_HUMAN) or (game.get_curr_player() == -1 and p2.IS_HUMAN)
+
+
+def play_game(p1: Player, p2: Player, dim: int = 3) -> int:
+    """Plays a full game between two players and returns the winner (1, -1, or 0 for a tie).
+    """
+    game = UltimateTicTacToe(dim=dim, verbose=False)
+    while not game.is_game_over():
+        if game.get_curr_player() == 1:
+            move = p1.choose_move(game)
+        else:
+            move = p2.choose_move(game)
+        game.update(move)
+    return game.get_winner()